@@ -84,7 +84,11 @@ function Prediction() {
         setResult(null);
 
         try {
-            const response = await axios.post('http://127.0.0.1:5000/predict', formData);
+            // The token identifies the analyst for the API's per-user rate limits.
+            const token = sessionStorage.getItem("token");
+            const response = await axios.post('http://127.0.0.1:5000/predict', formData, {
+                headers: token ? { Authorization: `Bearer ${token}` } : {}
+            });
             setResult(response.data);
             setShowModal(true);
             setShowExplanation(false);
@@ -0,0 +1,345 @@
+import argparse
+import atexit
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# -------------------------------
+# Configuration
+# -------------------------------
+AUDIT_DIR = "audit_log"
+SEGMENT_ROWS = 50000          # Rows per SQLite segment before rolling to a new file
+BATCH_SIZE = 500              # Firestore batched writes are capped at 500 operations
+FLUSH_INTERVAL = 1.0          # Seconds to wait for a batch to fill before flushing
+MAX_BUFFER = 10000            # Records held in memory before spilling to disk
+
+SEGMENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    user TEXT,
+    model_version TEXT,
+    prediction TEXT,
+    prob_non_recidivist REAL,
+    prob_recidivist REAL,
+    inputs TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_predictions_user ON predictions (user);
+"""
+
+
+# -------------------------------
+# Sinks
+# -------------------------------
+class SQLiteSegmentSink:
+    """Append-only store of numbered SQLite segment files."""
+
+    def __init__(self, directory=AUDIT_DIR, segment_rows=SEGMENT_ROWS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+        self._conn = None
+        self._rows = 0
+        self._segment = len(list_segments(directory))
+
+    def _open_segment(self):
+        # Reopen the newest segment if it still has room, otherwise start a new one.
+        self._segment = max(self._segment, 1)
+        while True:
+            path = os.path.join(self.directory, f"segment-{self._segment:06d}.sqlite")
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(SEGMENT_SCHEMA)
+            self._rows = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            if self._rows < self.segment_rows:
+                return
+            self._conn.close()
+            self._segment += 1
+
+    def write_batch(self, records):
+        rows = [(
+            record["timestamp"],
+            record.get("user"),
+            record.get("model_version"),
+            record.get("prediction"),
+            record.get("probabilities", {}).get("Non-Recidivist"),
+            record.get("probabilities", {}).get("Recidivist"),
+            json.dumps(record.get("inputs", {})),
+            record.get("source"),
+        ) for record in records]
+
+        while rows:
+            if self._conn is None:
+                self._open_segment()
+            elif self._rows >= self.segment_rows:
+                self._conn.close()
+                self._segment += 1
+                self._open_segment()
+
+            chunk, rows = rows[:self.segment_rows - self._rows], rows[self.segment_rows - self._rows:]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO predictions (timestamp, user, model_version, prediction, "
+                    "prob_non_recidivist, prob_recidivist, inputs, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    chunk
+                )
+            self._rows += len(chunk)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class FirestoreSink:
+    """Writes records to a Firestore collection using batched writes."""
+
+    def __init__(self, db, collection="prediction_audit"):
+        self.db = db
+        self.collection = collection
+
+    def write_batch(self, records):
+        for start in range(0, len(records), BATCH_SIZE):
+            batch = self.db.batch()
+            for record in records[start:start + BATCH_SIZE]:
+                batch.set(self.db.collection(self.collection).document(), record)
+            batch.commit()
+
+    def close(self):
+        pass
+
+
+# -------------------------------
+# Write-behind audit log
+# -------------------------------
+class AuditLog:
+    """
+    Buffers audit records in memory and flushes them to a sink in batches
+    on a background thread. Records that do not fit in the buffer, or batches
+    the sink fails to accept, are appended to a spill file and replayed once
+    the sink catches up.
+    """
+
+    def __init__(self, sink, max_buffer=MAX_BUFFER, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, spill_path=None):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path or os.path.join(AUDIT_DIR, "spill.jsonl")
+        self._replay_path = self.spill_path + ".replay"
+        self._replay_offset = 0
+        os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+
+        self._queue = queue.Queue(maxsize=max_buffer)
+        self._spill_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, **fields):
+        """Enqueue one record without blocking the caller."""
+        fields.setdefault("timestamp", time.time())
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self._spill([fields])
+
+    def _spill(self, records):
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+
+    def _has_spilled(self):
+        return os.path.exists(self.spill_path) or os.path.exists(self._replay_path)
+
+    def _replay_spill(self, max_batches=None):
+        """
+        Stream spilled records back to the sink in batch_size chunks, stopping
+        after max_batches chunks if given; the next call carries on from there.
+        A replay file left behind by a crash is resumed before the spill file
+        is taken, so records are delivered at least once.
+        """
+        with self._replay_lock:
+            return self._replay_spill_locked(max_batches)
+
+    def _replay_spill_locked(self, max_batches):
+        with self._spill_lock:
+            if not os.path.exists(self._replay_path):
+                if not os.path.exists(self.spill_path):
+                    return True
+                os.replace(self.spill_path, self._replay_path)
+                self._replay_offset = 0
+
+        # Batches the sink still rejects are spilled again by _write.
+        ok = True
+        batch = []
+        written = 0
+        with open(self._replay_path) as f:
+            f.seek(self._replay_offset)
+            for line in iter(f.readline, ""):
+                if line.strip():
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        print(f"Skipping unreadable audit record in {self._replay_path}: {line[:80]!r}")
+                if len(batch) == self.batch_size:
+                    ok = self._write(batch) and ok
+                    batch = []
+                    written += 1
+                    self._replay_offset = f.tell()
+                    if max_batches is not None and written >= max_batches:
+                        return ok
+        if batch:
+            ok = self._write(batch) and ok
+        os.remove(self._replay_path)
+        self._replay_offset = 0
+        return ok
+
+    def _write(self, records):
+        try:
+            with self._write_lock:
+                self.sink.write_batch(records)
+        except Exception as e:
+            print(f"Audit log sink failed, spilling {len(records)} records to disk: {e}")
+            self._spill(records)
+            return False
+        return True
+
+    def _next_batch(self):
+        records = []
+        deadline = time.time() + self.flush_interval
+        while len(records) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                records.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        while not self._stop.is_set():
+            records = self._next_batch()
+            if records:
+                ok = self._write(records)
+                if ok and self._has_spilled():
+                    # Drain the spill a chunk per live batch, so it empties under steady traffic too.
+                    ok = self._replay_spill(max_batches=1)
+            elif self._has_spilled() and not self._stop.is_set():
+                # close() makes its own final replay.
+                ok = self._replay_spill()
+            else:
+                continue
+            if not ok:
+                # Back off so a failing sink is not retried in a tight loop.
+                self._stop.wait(self.flush_interval)
+
+    def flush(self):
+        """Synchronously write everything buffered in memory."""
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(records), self.batch_size):
+            self._write(records[start:start + self.batch_size])
+
+    def close(self):
+        """
+        Stop the writer thread, flush the remaining records and make a last
+        attempt to replay the spill file. Anything the sink still rejects stays
+        spilled and is replayed on the next start.
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        if self._has_spilled():
+            self._replay_spill()
+        self.sink.close()
+
+
+# -------------------------------
+# Query tool
+# -------------------------------
+def list_segments(directory=AUDIT_DIR):
+    return sorted(glob.glob(os.path.join(directory, "segment-*.sqlite")))
+
+
+def query(directory=AUDIT_DIR, user=None, start=None, end=None, limit=None):
+    """
+    Yield audit records from the segment store, ordered by timestamp within each segment.
+    Segments whose time range does not overlap [start, end] are skipped
+    without scanning their rows.
+    """
+    conditions, params = [], []
+    if user is not None:
+        conditions.append("user = ?")
+        params.append(user)
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("timestamp <= ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    returned = 0
+    for path in list_segments(directory):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            low, high = conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM predictions").fetchone()
+            if low is None or (start is not None and high < start) or (end is not None and low > end):
+                continue
+
+            sql = ("SELECT timestamp, user, model_version, prediction, prob_non_recidivist, "
+                   f"prob_recidivist, inputs, source FROM predictions {where} ORDER BY timestamp")
+            for row in conn.execute(sql, params):
+                yield {
+                    "timestamp": row[0],
+                    "user": row[1],
+                    "model_version": row[2],
+                    "prediction": row[3],
+                    "probabilities": {"Non-Recidivist": row[4], "Recidivist": row[5]},
+                    "inputs": json.loads(row[6]),
+                    "source": row[7],
+                }
+                returned += 1
+                if limit is not None and returned >= limit:
+                    return
+        finally:
+            conn.close()
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the prediction audit log.")
+    parser.add_argument("--dir", default=AUDIT_DIR, help="Segment store directory")
+    parser.add_argument("--user", help="Only show predictions made by this user")
+    parser.add_argument("--start", help="ISO start time, e.g. 2025-01-31T09:00")
+    parser.add_argument("--end", help="ISO end time")
+    parser.add_argument("--limit", type=int, help="Maximum number of records")
+    args = parser.parse_args()
+
+    for record in query(args.dir, args.user, _parse_time(args.start), _parse_time(args.end), args.limit):
+        print(json.dumps(record))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Component micro-benchmarks for the prediction pipeline.
+
+Runs offline against small stand-in models (a tiny randomly initialised BERT
+and a small stacking ensemble), so no downloads or trained artefacts are
+needed. Results are compared against benchmark_baseline.json and the script
+exits 1 when any component is slower than its baseline by more than the
+tolerance, or 2 when there is no baseline to compare against.
+
+    python benchmark_components.py                 # check against the baseline
+    python benchmark_components.py --update        # record a new baseline
+    python benchmark_components.py --tolerance 0.5 --only lime
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import StackingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+from transformers import BertConfig, BertModel, BertTokenizer
+
+from fairness_audit import run_fairness_audit
+from prediction_utils import build_input_text, build_response, embed_texts, explain_prediction
+
+# -------------------------------
+# Configuration
+# -------------------------------
+BASELINE_PATH = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25            # Allowed slowdown relative to baseline (0.25 = 25%)
+EMBEDDING_BATCH_SIZES = [1, 8, 32, 128]
+AUDIT_ROWS = [10_000, 100_000, 1_000_000]
+EMBEDDING_DIM = 64
+
+SAMPLE_REQUEST = {
+    "gender": "M",
+    "race": "BLACK",
+    "age_at_release": 35,
+    "education_level": "High School Diploma",
+    "supervision_risk_score_first": 5,
+    "residence_puma": "12",
+    "jobs_per_year": 2
+}
+
+
+# -------------------------------
+# Stand-in models
+# -------------------------------
+def make_stand_in_bert():
+    """A two-layer BERT with a tiny vocabulary, shaped like bert-base-uncased but much smaller."""
+    words = ["m", "f", "black", "white", "high", "school", "diploma", "at", "least", "some",
+             "college", "less", "than", "hs", "or", "older", "."] + [str(i) for i in range(100)]
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words
+
+    # The tokenizer reads the vocabulary when it is built, so the file can go straight away.
+    with tempfile.TemporaryDirectory(prefix="bench_vocab_") as vocab_dir:
+        vocab_file = os.path.join(vocab_dir, "vocab.txt")
+        with open(vocab_file, "w") as f:
+            f.write("\n".join(vocab))
+        tokenizer = BertTokenizer(vocab_file)
+
+    config = BertConfig(vocab_size=len(vocab), hidden_size=EMBEDDING_DIM, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=128)
+    bert_model = BertModel(config).eval()
+    return tokenizer, bert_model
+
+
+def make_stand_in_ensemble(dim=EMBEDDING_DIM, rows=500, seed=0):
+    """A small stacking ensemble with the same interface as ensemble_model_downsampled.pkl."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, dim))
+    y = (X[:, 0] + 0.5 * rng.normal(size=rows) > 0).astype(int)
+    model = StackingClassifier(
+        estimators=[('lr', LogisticRegression(max_iter=200)),
+                    ('svm', SVC(probability=True, random_state=seed)),
+                    ('tree', DecisionTreeClassifier(max_depth=5, random_state=seed))],
+        final_estimator=LogisticRegression(max_iter=200)
+    )
+    return model.fit(X, y)
+
+
+def make_audit_data(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Gender": rng.choice(["M", "F"], size=rows, p=[0.85, 0.15]),
+        "Race": rng.choice(["BLACK", "WHITE"], size=rows),
+    })
+    y_test = pd.DataFrame({"Recidivism_Within_3years": rng.integers(0, 2, size=rows)})
+    y_pred = rng.integers(0, 2, size=rows)
+    return df, y_test, y_pred
+
+
+# -------------------------------
+# Timing
+# -------------------------------
+def time_call(fn, repeat=5):
+    """Best-of-repeat seconds per call, with enough calls per repeat to run for at least 0.2s."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(audit_rows=AUDIT_ROWS, only=None):
+    """Return {component name: seconds per call} for every selected component."""
+    tokenizer, bert_model = make_stand_in_bert()
+    model = make_stand_in_ensemble()
+    text = build_input_text(SAMPLE_REQUEST)
+    embedding = embed_texts(text, tokenizer, bert_model)
+    explanation = explain_prediction(model, embedding)
+    probabilities = model.predict_proba(embedding)[0]
+
+    benchmarks = {}
+    for batch_size in EMBEDDING_BATCH_SIZES:
+        texts = [text] * batch_size
+        benchmarks[f"get_embeddings[batch={batch_size}]"] = lambda texts=texts: embed_texts(texts, tokenizer, bert_model)
+    benchmarks["ensemble.predict"] = lambda: model.predict(embedding)
+    benchmarks["ensemble.predict_proba"] = lambda: model.predict_proba(embedding)
+    benchmarks["lime.explain_instance"] = lambda: explain_prediction(model, embedding)
+    benchmarks["build_response"] = lambda: json.dumps(build_response('Low Risk of Recidivism', explanation, probabilities))
+    for rows in audit_rows:
+        df, y_test, y_pred = make_audit_data(rows)
+
+        def audit(df=df, y_test=y_test, y_pred=y_pred):
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_fairness_audit(df, y_test, y_pred)
+        benchmarks[f"fairness_audit[rows={rows}]"] = audit
+
+    results = {}
+    for name, fn in benchmarks.items():
+        if only and only not in name:
+            continue
+        # The expensive components get fewer repeats so a full run stays short.
+        repeat = 3 if name.startswith(("lime", "fairness_audit")) else 5
+        results[name] = time_call(fn, repeat=repeat)
+        print(f"{name:<40} {results[name] * 1000:10.3f} ms")
+    return results
+
+
+# -------------------------------
+# Baseline comparison
+# -------------------------------
+def environment():
+    return {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor()}
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return (name, baseline seconds, current seconds) for components slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for name, seconds in results.items():
+        reference = baseline["results"].get(name)
+        if reference is not None and seconds > reference * (1 + tolerance):
+            regressions.append((name, reference, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run component micro-benchmarks against the stored baseline.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown as a fraction of the baseline time")
+    parser.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--only", help="Only run components whose name contains this string")
+    parser.add_argument("--audit-rows", type=int, nargs="+", default=AUDIT_ROWS,
+                        help="Synthetic dataset sizes for the fairness audit benchmark")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None and not args.update:
+        # Without a baseline the gate cannot pass or fail, so treat it as a failure.
+        print(f"No baseline at {args.baseline}; run with --update to record one.")
+        return 2
+
+    results = run_benchmarks(args.audit_rows, args.only)
+
+    if args.update:
+        baseline = baseline or {"results": {}}
+        baseline["results"].update(results)
+        save_baseline(baseline["results"], args.baseline)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if baseline.get("environment") != environment():
+        print(f"\nWarning: baseline was recorded on {baseline.get('environment')}, "
+              f"this run is on {environment()}.")
+
+    missing = [name for name in results if name not in baseline["results"]]
+    for name in missing:
+        print(f"No baseline for {name}, skipping comparison.")
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} component(s) regressed by more than {args.tolerance:.0%}:")
+        for name, reference, seconds in regressions:
+            print(f"  {name}: {reference * 1000:.3f} ms -> {seconds * 1000:.3f} ms "
+                  f"({seconds / reference - 1:+.0%})")
+        return 1
+
+    print(f"\nAll components within {args.tolerance:.0%} of baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
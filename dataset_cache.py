@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Columnar cache for the NIJ Full_Dataset.csv.
+
+The CSV is parsed once and written to Parquet with categorical dtypes for
+string columns and a stable row_id (the row's position in the CSV). Readers
+then load only the columns they need, optionally filtered in the Parquet
+reader, instead of re-parsing the whole CSV.
+
+    python dataset_cache.py            # build the cache if it is missing or stale
+    python dataset_cache.py --report   # compare CSV and cache load time and memory
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Configuration
+# -------------------------------
+CSV_PATH = "Full_Dataset.csv"
+CACHE_PATH = "Full_Dataset.parquet"
+ROW_GROUP_SIZE = 8192       # Smaller row groups let filters skip more of the file
+
+# Columns joined (in this order) into the text the BERT model is trained on.
+TEXT_COLUMNS = ["Gender", "Race", "Age_at_Release", "Education_Level",
+                "Supervision_Risk_Score_First", "Residence_PUMA", "Jobs_Per_Year"]
+
+
+def build_cache(csv_path=CSV_PATH, cache_path=CACHE_PATH):
+    """Convert the CSV to a typed Parquet cache and return the cached DataFrame."""
+    df = pd.read_csv(csv_path)
+    for column in df.columns:
+        # pandas 3 reads text as the str dtype rather than object.
+        if pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column]):
+            df[column] = df[column].astype("category")
+    df.insert(0, "row_id", np.arange(len(df), dtype=np.int64))
+    df.to_parquet(cache_path, engine="pyarrow", index=False, row_group_size=ROW_GROUP_SIZE)
+    return df
+
+
+def cache_is_stale(csv_path=CSV_PATH, cache_path=CACHE_PATH):
+    return not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(csv_path)
+
+
+def load_dataset(columns=None, filters=None, csv_path=CSV_PATH, cache_path=CACHE_PATH):
+    """
+    Load the dataset from the Parquet cache, building it first if needed.
+
+    columns: only these columns are read from disk.
+    filters: pyarrow filters, e.g. [("Gender", "==", "M")], applied while reading.
+
+    The result is indexed by row_id, so index values are CSV row positions
+    even when a filter drops rows.
+    """
+    if cache_is_stale(csv_path, cache_path):
+        build_cache(csv_path, cache_path)
+
+    if columns is not None:
+        columns = ["row_id"] + [column for column in columns if column != "row_id"]
+    df = pd.read_parquet(cache_path, engine="pyarrow", columns=columns, filters=filters)
+    return df.set_index("row_id")
+
+
+def _column_as_text(column):
+    # Convert each distinct value to text once and gather by code, instead of
+    # calling str() on every row. Missing values become 'nan', as astype(str)
+    # produced for the training text before pandas 3.
+    codes, uniques = pd.factorize(column)
+    labels = np.append(np.asarray([str(value) for value in uniques], dtype=object), "nan")
+    return labels[codes]
+
+
+def build_model_text(df, columns=TEXT_COLUMNS):
+    """
+    Build the model input text for every row, matching
+    prediction_utils.build_input_text and the notebooks' astype(str) concatenation.
+    """
+    parts = [pd.Series(_column_as_text(df[column]), index=df.index) for column in columns]
+    return parts[0].str.cat(parts[1:], sep=" ")
+
+
+# -------------------------------
+# Load time and memory report
+# -------------------------------
+def _measure(load):
+    start = time.perf_counter()
+    df = load()
+    seconds = time.perf_counter() - start
+    return df, seconds, df.memory_usage(deep=True).sum() / 1e6
+
+
+def report(csv_path=CSV_PATH, cache_path=CACHE_PATH, columns=("Gender", "Race")):
+    if cache_is_stale(csv_path, cache_path):
+        build_cache(csv_path, cache_path)
+
+    rows = [
+        ("read_csv, all columns", lambda: pd.read_csv(csv_path)),
+        ("cache, all columns", lambda: load_dataset(csv_path=csv_path, cache_path=cache_path)),
+        (f"read_csv, {', '.join(columns)}", lambda: pd.read_csv(csv_path, usecols=list(columns))),
+        (f"cache, {', '.join(columns)}",
+         lambda: load_dataset(list(columns), csv_path=csv_path, cache_path=cache_path)),
+    ]
+    print(f"{'Load':<40} {'Time (s)':>10} {'Memory (MB)':>12}")
+    for name, load in rows:
+        _, seconds, megabytes = _measure(load)
+        print(f"{name:<40} {seconds:>10.3f} {megabytes:>12.1f}")
+
+    # Time each text build on the frame its callers have: the notebooks concatenate
+    # on a freshly parsed CSV, build_model_text runs on the categorical cache.
+    raw = pd.read_csv(csv_path, usecols=TEXT_COLUMNS)
+    start = time.perf_counter()
+    (raw[TEXT_COLUMNS[0]].astype(str) + ' ' + raw[TEXT_COLUMNS[1]].astype(str) + ' ' +
+     raw[TEXT_COLUMNS[2]].astype(str) + ' ' + raw[TEXT_COLUMNS[3]].astype(str) + ' ' +
+     raw[TEXT_COLUMNS[4]].astype(str) + ' ' + raw[TEXT_COLUMNS[5]].astype(str) + ' ' +
+     raw[TEXT_COLUMNS[6]].astype(str))
+    astype_seconds = time.perf_counter() - start
+    cached = load_dataset(TEXT_COLUMNS, csv_path=csv_path, cache_path=cache_path)
+    start = time.perf_counter()
+    build_model_text(cached)
+    vectorized_seconds = time.perf_counter() - start
+    print(f"\nModel text, astype(str) concatenation: {astype_seconds:.3f}s")
+    print(f"Model text, build_model_text:          {vectorized_seconds:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Parquet cache of Full_Dataset.csv.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the cache is up to date")
+    parser.add_argument("--report", action="store_true", help="Print load time and memory before and after")
+    args = parser.parse_args()
+
+    if args.rebuild or cache_is_stale(args.csv, args.cache):
+        df = build_cache(args.csv, args.cache)
+        print(f"Cached {len(df)} rows from {args.csv} to {args.cache}")
+    if args.report:
+        report(args.csv, args.cache)
+
+
+if __name__ == '__main__':
+    main()
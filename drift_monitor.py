@@ -0,0 +1,281 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+# -------------------------------
+# Field configuration
+# -------------------------------
+# Categorical /predict fields and their NIJ training-set column names.
+CATEGORICAL_FIELDS = {
+    "gender": "Gender",
+    "race": "Race",
+    "education_level": "Education_Level",
+    "residence_puma": "Residence_PUMA",
+}
+
+# NIJ releases ages in brackets (18-22, 23-27, ..., 48 or older), so live ages
+# are binned on the same bracket edges rather than on a uniform grid. The last
+# bracket ends at 80, the upper bound Prediction.js accepts.
+AGE_BRACKET_EDGES = [18, 23, 28, 33, 38, 43, 48, 81]
+
+# Numeric /predict fields, their NIJ column names and the histogram bin edges.
+# Ranges match the validation rules in Prediction.js.
+NUMERIC_FIELDS = {
+    "age_at_release": ("Age_at_Release", AGE_BRACKET_EDGES),
+    "supervision_risk_score_first": ("Supervision_Risk_Score_First", np.linspace(1, 10, 33)),
+    "jobs_per_year": ("Jobs_Per_Year", np.linspace(0, 8, 33)),
+}
+
+# Scores above these are reported as drifted by /drift. Each metric has its own
+# scale: PSI for numeric fields (0.2 is the usual "significant shift" cut-off),
+# total variation distance for categorical fields (a 0..1 share of traffic that
+# moved between categories) and the standardised shift score for embeddings.
+DRIFT_THRESHOLDS = {
+    "numeric": 0.2,
+    "categorical": 0.1,
+    "embedding": 0.5,
+}
+
+
+def _normalize_category(value):
+    return str(value).strip().upper()
+
+
+def _parse_numeric(value):
+    """Parse a numeric field, including NIJ age brackets such as '23-27' or '48 or older'."""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    match = re.search(r"\d+(?:\.\d+)?", str(value))
+    if match is None:
+        return None
+    # A bracket's lower bound falls in the same AGE_BRACKET_EDGES bin as the raw ages it covers.
+    return float(match.group())
+
+
+# -------------------------------
+# Streaming sketches
+# -------------------------------
+class CountMinSketch:
+    """Fixed-size frequency sketch for a categorical field."""
+
+    def __init__(self, width=64, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _buckets(self, key):
+        data = key.encode("utf-8")
+        # crc32 with a per-row seed is stable across processes, unlike hash().
+        return [zlib.crc32(data, row) % self.width for row in range(self.depth)]
+
+    def update(self, key, count=1):
+        for row, bucket in enumerate(self._buckets(key)):
+            self.table[row, bucket] += count
+        self.total += count
+
+    def estimate(self, key):
+        return int(min(self.table[row, bucket] for row, bucket in enumerate(self._buckets(key))))
+
+    def distance(self, other):
+        """Total variation distance between the two hashed distributions, averaged over rows."""
+        if self.total == 0 or other.total == 0:
+            return 0.0
+        p = self.table / self.total
+        q = other.table / other.total
+        return float(np.mean(0.5 * np.abs(p - q).sum(axis=1)))
+
+
+class HistogramQuantileSketch:
+    """Fixed-bin quantile sketch over a bounded numeric range."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        # Bin i holds [edges[i-1], edges[i]); bins 0 and len(edges) hold values
+        # below and above the configured range.
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.total = 0
+
+    def update(self, value, count=1):
+        index = int(np.searchsorted(self.edges, value, side="right"))
+        self.counts[index] += count
+        self.total += count
+
+    def quantile(self, q):
+        """Approximate quantile: the bin midpoint, or the nearest edge when it falls outside the range."""
+        if self.total == 0:
+            return None
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, q * self.total))
+        if index == 0:
+            return float(self.edges[0])
+        if index == len(self.edges):
+            return float(self.edges[-1])
+        return float((self.edges[index - 1] + self.edges[index]) / 2)
+
+    def out_of_range(self):
+        """Fraction of values that fell below the first edge or at/above the last one."""
+        if self.total == 0:
+            return 0.0
+        return float((self.counts[0] + self.counts[-1]) / self.total)
+
+    def distance(self, other):
+        """Population stability index between the two histograms."""
+        if self.total == 0 or other.total == 0:
+            return 0.0
+        eps = 1e-6
+        p = self.counts / self.total + eps
+        q = other.counts / other.total + eps
+        return float(np.sum((p - q) * np.log(p / q)))
+
+
+class RunningMoments:
+    """Running per-dimension mean and variance of CLS embeddings (Welford's algorithm)."""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros(dim)
+
+    def update(self, vector):
+        vector = np.asarray(vector, dtype=np.float64).reshape(-1)
+        self.count += 1
+        delta = vector - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (vector - self.mean)
+
+    def variance(self):
+        if self.count < 2:
+            return np.zeros(self.dim)
+        return self.m2 / (self.count - 1)
+
+    def distance(self, other):
+        """Standardised mean shift plus relative change in total variance."""
+        if self.count < 2 or other.count < 2:
+            return 0.0
+        self_var = self.variance()
+        other_var = other.variance()
+        scale = np.sqrt(other_var) + 1e-8
+        mean_shift = np.linalg.norm((self.mean - other.mean) / scale) / np.sqrt(self.dim)
+        variance_change = abs(self_var.sum() - other_var.sum()) / (other_var.sum() + 1e-8)
+        return float(mean_shift + variance_change)
+
+    @classmethod
+    def from_array(cls, vectors):
+        """Build the moments for a whole embedding matrix in one vectorised pass."""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        moments = cls(vectors.shape[1])
+        moments.count = vectors.shape[0]
+        moments.mean = vectors.mean(axis=0)
+        moments.m2 = ((vectors - moments.mean) ** 2).sum(axis=0)
+        return moments
+
+
+# -------------------------------
+# Drift monitor
+# -------------------------------
+class DriftMonitor:
+    """Constant-memory summary of /predict inputs and embeddings."""
+
+    def __init__(self, embedding_dim=768, cms_width=64, cms_depth=4):
+        self.categorical = {field: CountMinSketch(cms_width, cms_depth) for field in CATEGORICAL_FIELDS}
+        self.numeric = {field: HistogramQuantileSketch(edges) for field, (_, edges) in NUMERIC_FIELDS.items()}
+        self.embeddings = RunningMoments(embedding_dim)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def update(self, data, embedding=None):
+        """Fold one request into the summaries in constant time."""
+        with self._lock:
+            for field, sketch in self.categorical.items():
+                if field in data:
+                    sketch.update(_normalize_category(data[field]))
+            for field, sketch in self.numeric.items():
+                value = _parse_numeric(data.get(field))
+                if value is not None:
+                    sketch.update(value)
+            if embedding is not None:
+                self.embeddings.update(embedding)
+            self.count += 1
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def drift_scores(self, baseline):
+        """Compare these summaries with a baseline monitor built from the training data."""
+        with self._lock:
+            fields = {}
+            for field, sketch in self.categorical.items():
+                fields[field] = sketch.distance(baseline.categorical[field])
+            for field, sketch in self.numeric.items():
+                fields[field] = sketch.distance(baseline.numeric[field])
+            embedding_score = self.embeddings.distance(baseline.embeddings)
+            quantiles = {field: {"p50": sketch.quantile(0.5), "p90": sketch.quantile(0.9),
+                                 "out_of_range": round(sketch.out_of_range(), 4)}
+                         for field, sketch in self.numeric.items()}
+            return {
+                "requests_seen": self.count,
+                "fields": {field: round(score, 4) for field, score in fields.items()},
+                "embedding": round(embedding_score, 4),
+                "quantiles": quantiles,
+            }
+
+
+def find_drifted(scores, thresholds=DRIFT_THRESHOLDS):
+    """Return the fields (and "embedding") of a drift_scores() result whose score exceeds its metric's threshold."""
+    drifted = []
+    for field, score in scores["fields"].items():
+        kind = "categorical" if field in CATEGORICAL_FIELDS else "numeric"
+        if score > thresholds[kind]:
+            drifted.append(field)
+    if scores["embedding"] > thresholds["embedding"]:
+        drifted.append("embedding")
+    return drifted
+
+
+def build_baseline(df, embeddings=None, **kwargs):
+    """Build a baseline DriftMonitor from the NIJ training DataFrame and its CLS embeddings."""
+    dim = embeddings.shape[1] if embeddings is not None else kwargs.pop("embedding_dim", 768)
+    baseline = DriftMonitor(embedding_dim=dim, **kwargs)
+
+    for field, column in CATEGORICAL_FIELDS.items():
+        counts = df[column].map(_normalize_category).value_counts()
+        for value, count in counts.items():
+            baseline.categorical[field].update(value, int(count))
+
+    for field, (column, _) in NUMERIC_FIELDS.items():
+        values = df[column].dropna().map(_parse_numeric).dropna()
+        for value, count in values.value_counts().items():
+            baseline.numeric[field].update(value, int(count))
+
+    if embeddings is not None:
+        baseline.embeddings = RunningMoments.from_array(embeddings)
+
+    baseline.count = len(df)
+    return baseline
+
+
+if __name__ == '__main__':
+    import joblib
+    from dataset_cache import load_dataset
+
+    columns = list(CATEGORICAL_FIELDS.values()) + [column for column, _ in NUMERIC_FIELDS.values()]
+    df = load_dataset(columns=columns)
+    try:
+        train_embeddings = np.load('X_train_embeddings.npy')
+    except FileNotFoundError:
+        print("X_train_embeddings.npy not found, building baseline without embeddings.")
+        train_embeddings = None
+
+    baseline = build_baseline(df, train_embeddings)
+    joblib.dump(baseline, 'drift_baseline.pkl')
+    print(f"Saved drift baseline built from {baseline.count} rows to drift_baseline.pkl")
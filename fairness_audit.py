@@ -3,45 +3,33 @@ import numpy as np
 import joblib
 from fairlearn.metrics import MetricFrame, demographic_parity_difference, equalized_odds_difference
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-
-# Load saved model
-ensemble_model = joblib.load('ensemble_model_downsampled.pkl')
-
-# Load dataset (Ensure it includes Gender and Race for fairness audit)
-df = pd.read_csv('Full_Dataset.csv')
-
-# Load precomputed test embeddings
-X_test_embeddings = np.load('X_test_embeddings.npy')  # Ensure embeddings are saved separately
-y_test = pd.read_csv('y_test.csv')  # Load corresponding test labels
-
-# Get model predictions
-y_pred = ensemble_model.predict(X_test_embeddings)
+from dataset_cache import load_dataset
 
 # Fairness Audit for Gender and Race
-sensitive_attrs = ['Gender', 'Race']
-
-for attr in sensitive_attrs:
-    if attr in df.columns:
-        print(f"\n🔎 Fairness Audit for {attr}:")
-        for group in df[attr].unique():
-            group_idx = df[df[attr] == group].index
-            
-            if len(group_idx) > 0:
-                y_true = y_test.iloc[group_idx]
-                y_pred_group = y_pred[group_idx]
-                
-                tn, fp, fn, tp = confusion_matrix(y_true, y_pred_group).ravel()
+def group_error_rates(df, y_test, y_pred, sensitive_attrs):
+    """Print accuracy, FPR and FNR for each group of each sensitive attribute."""
+    for attr in sensitive_attrs:
+        if attr in df.columns:
+            print(f"\n🔎 Fairness Audit for {attr}:")
+            for group in df[attr].unique():
+                group_idx = df[df[attr] == group].index
                 
-                fpr = fp / (fp + tn) if (fp + tn) > 0 else 0  # Handle division by zero
-                fnr = fn / (fn + tp) if (fn + tp) > 0 else 0
-                
-                print(f"{attr} = {group}:")
-                print(f"  - Accuracy: {accuracy_score(y_true, y_pred_group):.4f}")
-                print(f"  - False Positive Rate (FPR): {fpr:.4f}")
-                print(f"  - False Negative Rate (FNR): {fnr:.4f}")
+                if len(group_idx) > 0:
+                    y_true = y_test.iloc[group_idx]
+                    y_pred_group = y_pred[group_idx]
+                    
+                    tn, fp, fn, tp = confusion_matrix(y_true, y_pred_group).ravel()
+                    
+                    fpr = fp / (fp + tn) if (fp + tn) > 0 else 0  # Handle division by zero
+                    fnr = fn / (fn + tp) if (fn + tp) > 0 else 0
+                    
+                    print(f"{attr} = {group}:")
+                    print(f"  - Accuracy: {accuracy_score(y_true, y_pred_group):.4f}")
+                    print(f"  - False Positive Rate (FPR): {fpr:.4f}")
+                    print(f"  - False Negative Rate (FNR): {fnr:.4f}")
 
 # Disparate Impact Ratio Calculation
-def disparate_impact(y_pred, sensitive_attr):
+def disparate_impact(df, y_pred, sensitive_attr):
     """Calculate Disparate Impact Ratio (DIR) for each sensitive attribute."""
     for attr in sensitive_attr:
         print(f"\n⚖️ Disparate Impact Analysis for {attr}:")
@@ -60,9 +48,6 @@ def disparate_impact(y_pred, sensitive_attr):
                 
                 print(f"{attr} = {group}: Selection Rate = {selection_rate:.4f}, DIR = {dir_ratio:.4f}")
 
-# Perform Disparate Impact Analysis
-disparate_impact(y_pred, ['Gender', 'Race'])
-
 # Fairlearn Metrics for Equalized Odds and Demographic Parity
 def fairness_metrics(y_true, y_pred, sensitive_feature):
     metric_frame = MetricFrame(
@@ -87,6 +72,29 @@ def fairness_metrics(y_true, y_pred, sensitive_feature):
     print(f"  - Demographic Parity Difference: {demographic_parity:.4f}")
     print(f"  - Equalized Odds Difference: {equalized_odds:.4f}")
 
-# Evaluate fairness for Gender and Race
-for attr in ['Gender', 'Race']:
-    fairness_metrics(y_test, y_pred, df[attr])
\ No newline at end of file
+def run_fairness_audit(df, y_test, y_pred, sensitive_attrs=('Gender', 'Race')):
+    """Run the full audit: per-group error rates, disparate impact and Fairlearn metrics."""
+    group_error_rates(df, y_test, y_pred, sensitive_attrs)
+
+    # Perform Disparate Impact Analysis
+    disparate_impact(df, y_pred, sensitive_attrs)
+
+    # Evaluate fairness for Gender and Race
+    for attr in sensitive_attrs:
+        fairness_metrics(y_test, y_pred, df[attr])
+
+if __name__ == '__main__':
+    # Load saved model
+    ensemble_model = joblib.load('ensemble_model_downsampled.pkl')
+
+    # Load only the sensitive attributes from the cached dataset (indexed by CSV row position)
+    df = load_dataset(columns=['Gender', 'Race'])
+
+    # Load precomputed test embeddings
+    X_test_embeddings = np.load('X_test_embeddings.npy')  # Ensure embeddings are saved separately
+    y_test = pd.read_csv('y_test.csv')  # Load corresponding test labels
+
+    # Get model predictions
+    y_pred = ensemble_model.predict(X_test_embeddings)
+
+    run_fairness_audit(df, y_test, y_pred)
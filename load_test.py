@@ -153,7 +153,8 @@ PAYLOAD = {
     "residence_puma": "12345",
     "jobs_per_year": 2
 }
-HEADERS = {"Content-Type": "application/json"}
+# Load tests run as bulk traffic so they do not compete with analysts using the UI.
+HEADERS = {"Content-Type": "application/json", "X-Request-Class": "bulk"}
 
 # -------------------------------
 # Utility function to send one POST request
@@ -0,0 +1,153 @@
+import math
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from lime.lime_tabular import LimeTabularExplainer
+
+REQUIRED_FIELDS = ["gender", "race", "age_at_release", "education_level",
+                   "supervision_risk_score_first", "residence_puma", "jobs_per_year"]
+
+FEATURE_MAP = [
+    "Gender", "Race", "Age at Release", "Education Level",
+    "Supervision Risk Score", "Residence PUMA", "Jobs per Year"
+]
+
+CLASS_NAMES = ['Non-Recidivist', 'Recidivist']
+
+# Largest number of variant profiles a single /what_if request may score.
+MAX_WHAT_IF_POINTS = 100
+
+
+def build_input_text(data):
+    """Join the request fields into the text the BERT model is given."""
+    return " ".join(str(data[field]) for field in REQUIRED_FIELDS)
+
+
+def embed_texts(texts, tokenizer, bert_model):
+    """Return the CLS embedding for a single text or a list of texts, one row per text."""
+    inputs = tokenizer(texts, return_tensors='pt', padding=True, truncation=True, max_length=512)
+    with torch.no_grad():
+        output = bert_model(**inputs)
+    return output.last_hidden_state[:, 0, :].numpy()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of CLS embeddings keyed by input text."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, texts, embed):
+        """
+        Return one embedding row per text. Texts not in the cache are embedded
+        together with a single embed(list_of_texts) call and then cached.
+        """
+        rows = {}
+        with self._lock:
+            for text in texts:
+                if text in self._entries:
+                    self._entries.move_to_end(text)
+                    rows[text] = self._entries[text]
+
+        missing = list(dict.fromkeys(text for text in texts if text not in rows))
+        if missing:
+            embeddings = embed(missing)
+            with self._lock:
+                for text, row in zip(missing, embeddings):
+                    # Copy so a cached row does not keep its whole batch array alive.
+                    rows[text] = self._entries[text] = row.copy()
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return np.stack([rows[text] for text in texts])
+
+
+def explain_prediction(model, embedding, num_features=7):
+    """Run LIME on a single (1, dim) embedding and return its (feature, weight) list."""
+    feature_names = [f'feature_{i}' for i in range(embedding.shape[1])]
+    explainer = LimeTabularExplainer(training_data=np.random.rand(10, embedding.shape[1]),
+                                     mode='classification',
+                                     feature_names=feature_names,
+                                     class_names=CLASS_NAMES)
+    exp = explainer.explain_instance(embedding.flatten(), model.predict_proba, num_features=num_features)
+    return exp.as_list()
+
+
+def build_response(prediction_label, explanation, probabilities):
+    """Build the /predict JSON body from the label, LIME explanation and class probabilities."""
+    explanation_text = f"Based on the information provided, the person is predicted to be a {prediction_label}.\n"
+
+    feature_importance = {}
+
+    for feature, importance in explanation:
+        match = re.match(r"feature_(\d+)", feature)
+        if match:
+            feature_index = int(match.group(1)) % len(FEATURE_MAP)
+            feature_name = FEATURE_MAP[feature_index]
+
+            if feature_name not in feature_importance or abs(importance) > abs(feature_importance[feature_name]):
+                feature_importance[feature_name] = importance
+
+    for feature_name, importance in feature_importance.items():
+        explanation_text += f"The person's {feature_name} had a {importance * 100:.2f}% influence on the prediction.\n"
+
+    return {
+        "prediction": prediction_label,
+        "explanation_text": explanation_text,
+        "probabilities": format_probabilities(probabilities)
+    }
+
+
+def format_probabilities(probabilities):
+    return {
+        "Non-Recidivist": round(float(probabilities[0]) * 100, 2),
+        "Recidivist": round(float(probabilities[1]) * 100, 2)
+    }
+
+
+def expand_sweep(vary):
+    """
+    Turn a /what_if "vary" mapping into {field: [values]}. Each field takes
+    either a list of values or a {"start", "stop", "step"} range (stop inclusive).
+    Raises ValueError for unknown fields, bad ranges or grids larger than
+    MAX_WHAT_IF_POINTS.
+    """
+    if not isinstance(vary, dict) or not vary:
+        raise ValueError("'vary' must map at least one field to a list of values or a range")
+
+    sweep, total = {}, 0
+    for field, spec in vary.items():
+        if field not in REQUIRED_FIELDS:
+            raise ValueError(f"Unknown field to vary: {field}")
+
+        if isinstance(spec, list):
+            values = spec
+        elif isinstance(spec, dict) and {"start", "stop"} <= spec.keys():
+            start, stop, step = spec["start"], spec["stop"], spec.get("step", 1)
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (start, stop, step)):
+                raise ValueError(f"Range for {field} must be numeric")
+            if not all(math.isfinite(v) for v in (start, stop, step)):
+                raise ValueError(f"Range for {field} must be finite")
+            if step <= 0 or stop < start:
+                raise ValueError(f"Invalid range for {field}: need step > 0 and stop >= start")
+            # Check the span before flooring it: a huge range or tiny step overflows to inf.
+            span = (stop - start) / step
+            if not math.isfinite(span) or span > MAX_WHAT_IF_POINTS:
+                raise ValueError(f"What-if grid exceeds {MAX_WHAT_IF_POINTS} points")
+            count = math.floor(span + 1e-9) + 1
+            if total + count > MAX_WHAT_IF_POINTS:
+                raise ValueError(f"What-if grid exceeds {MAX_WHAT_IF_POINTS} points")
+            values = [round(start + i * step, 6) for i in range(count)]
+        else:
+            raise ValueError(f"Values for {field} must be a list or a {{start, stop, step}} range")
+
+        total += len(values)
+        if total > MAX_WHAT_IF_POINTS:
+            raise ValueError(f"What-if grid exceeds {MAX_WHAT_IF_POINTS} points")
+        sweep[field] = values
+    return sweep
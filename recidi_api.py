@@ -1,14 +1,21 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import joblib
-import numpy as np
-import torch
 from transformers import BertTokenizer, BertModel
-from lime.lime_tabular import LimeTabularExplainer
-from flask_jwt_extended import create_access_token, jwt_required, JWTManager
+from flask_jwt_extended import create_access_token, jwt_required, JWTManager, verify_jwt_in_request, get_jwt_identity
 import firebase_admin
 from firebase_admin import credentials, firestore
-import re
+import os
+import hashlib
+import math
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from audit_log import AuditLog, FirestoreSink, SQLiteSegmentSink
+from drift_monitor import DriftMonitor, DRIFT_THRESHOLDS, find_drifted
+from prediction_utils import (REQUIRED_FIELDS, EmbeddingCache, build_input_text, build_response, embed_texts,
+                              expand_sweep, explain_prediction, format_probabilities)
+from scheduler import (BULK, INTERACTIVE, DeadlineExceeded, PriorityScheduler, QueueFull,
+                       RateLimited, RateLimiter)
 
 app = Flask(__name__)
 CORS(app)
@@ -20,11 +27,15 @@ cred = credentials.Certificate("firebase/recidivision-6101d-firebase-adminsdk-fb
 firebase_admin.initialize_app(cred)
 db = firestore.client()
 
+MODEL_PATH = 'ensemble_model_downsampled.pkl'
+
 try:
-    model = joblib.load('ensemble_model_downsampled.pkl')
+    model = joblib.load(MODEL_PATH)
+    with open(MODEL_PATH, 'rb') as f:
+        MODEL_VERSION = hashlib.sha256(f.read()).hexdigest()[:12]
 except Exception as e:
     print(f"Error loading model: {e}")
-    model = None
+    model, MODEL_VERSION = None, None
 
 try:
     tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
@@ -33,15 +44,50 @@ except Exception as e:
     print(f"Error loading BERT model: {e}")
     tokenizer, bert_model = None, None
 
-def get_embeddings(text):
+try:
+    drift_baseline = joblib.load('drift_baseline.pkl')
+except Exception as e:
+    print(f"Error loading drift baseline: {e}")
+    drift_baseline = None
+
+drift_monitor = DriftMonitor(embedding_dim=drift_baseline.embeddings.dim if drift_baseline is not None else 768)
+
+# Set AUDIT_SINK=firestore to send the prediction audit log to Firestore instead of local segments.
+if os.environ.get("AUDIT_SINK") == "firestore":
+    audit_log = AuditLog(FirestoreSink(db))
+else:
+    audit_log = AuditLog(SQLiteSegmentSink())
+
+# Inference runs on a shared worker pool; one worker is kept free of bulk work
+# so analysts using the UI are not queued behind batch clients.
+inference_scheduler = PriorityScheduler(workers=4, reserved_interactive=1)
+# Per-identity (requests per second, burst) limits for each traffic class. The
+# interactive budget is sized for an analyst submitting the form by hand; callers
+# going faster than that are demoted to bulk whatever X-Request-Class says.
+rate_limiter = RateLimiter({INTERACTIVE: (0.2, 5), BULK: (20, 40)})
+# Seconds a request may wait when the client does not send X-Client-Timeout,
+# and the most a client may ask for.
+DEFAULT_CLIENT_TIMEOUT = {INTERACTIVE: 30.0, BULK: 120.0}
+
+def current_identity():
+    """Return the JWT identity of the caller, or None for anonymous requests."""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+# Embeddings of recently seen input texts, shared by /predict and /what_if.
+embedding_cache = EmbeddingCache(maxsize=4096)
+
+def get_embeddings(texts):
+    """Return CLS embeddings for a text or list of texts, embedding cache misses in one batch."""
     if tokenizer is None or bert_model is None:
         raise ValueError("BERT tokenizer/model not loaded properly.")
 
-    inputs = tokenizer(text, return_tensors='pt', padding=True, truncation=True, max_length=512)
-    with torch.no_grad():
-        output = bert_model(**inputs)
-    embedding = output.last_hidden_state[:, 0, :].numpy()
-    return embedding 
+    if isinstance(texts, str):
+        texts = [texts]
+    return embedding_cache.get_many(texts, lambda missing: embed_texts(missing, tokenizer, bert_model))
 
 
 @app.route('/register', methods=['POST'])
@@ -78,79 +124,166 @@ def login():
     else:
         return jsonify({"error": "Invalid username or password"}), 401
 
+def schedule(fn, *args):
+    """
+    Run fn(*args) on the inference scheduler and turn its (body, status) result
+    into a response. Callers send X-Request-Class: bulk for automated traffic
+    and X-Client-Timeout (seconds) to have the request dropped once they have
+    given up on it. Requests count against the caller's JWT identity, or their
+    address when anonymous.
+    """
+    priority = BULK if request.headers.get("X-Request-Class", "").lower() == BULK else INTERACTIVE
+    identity = current_identity() or request.remote_addr
+
+    timeout = request.headers.get("X-Client-Timeout", DEFAULT_CLIENT_TIMEOUT[priority], type=float)
+    if not math.isfinite(timeout) or timeout <= 0:
+        return jsonify({"error": "X-Client-Timeout must be a positive number of seconds"}), 400
+    timeout = min(timeout, DEFAULT_CLIENT_TIMEOUT[priority])
+
+    try:
+        priority = rate_limiter.admit(identity, priority)
+    except RateLimited as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(math.ceil(e.retry_after))}
+
+    try:
+        future = inference_scheduler.submit(fn, *args, priority=priority, deadline=time.monotonic() + timeout)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    try:
+        body, status = future.result(timeout=timeout)
+    except (DeadlineExceeded, FutureTimeoutError):
+        future.cancel()
+        return jsonify({"error": "Request timed out waiting for an inference worker."}), 504
+    return jsonify(body), status
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
         data = request.json
 
-        required_fields = ["gender", "race", "age_at_release", "education_level", 
-                           "supervision_risk_score_first", "residence_puma", "jobs_per_year"]
-
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({"error": f"Missing field: {field}"}), 400
 
-        user_inputs = [
-            data["gender"], 
-            data["race"], 
-            data["age_at_release"], 
-            data["education_level"], 
-            data["supervision_risk_score_first"], 
-            data["residence_puma"], 
-            data["jobs_per_year"]
-        ]
+        return schedule(run_prediction, data, current_identity())
 
-        user_input_text = " ".join(map(str, user_inputs))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def run_prediction(data, user):
+    try:
+        user_input_text = build_input_text(data)
 
         embedding = get_embeddings(user_input_text)
+        drift_monitor.update(data, embedding)
 
         if model is None:
-            return jsonify({"error": "Model not loaded properly."}), 200
+            return {"error": "Model not loaded properly."}, 200
 
         prediction = model.predict(embedding)
         prediction_label = 'High Risk of Recidivism' if prediction[0] == 1 else 'Low Risk of Recidivism'
 
-        feature_names = [f'feature_{i}' for i in range(embedding.shape[1])]
-        explainer = LimeTabularExplainer(training_data=np.random.rand(10, embedding.shape[1]),
-                                         mode='classification',
-                                         feature_names=feature_names,
-                                         class_names=['Non-Recidivist', 'Recidivist'])
-        exp = explainer.explain_instance(embedding.flatten(), model.predict_proba, num_features=7)
-        explanation = exp.as_list()
+        explanation = explain_prediction(model, embedding)
         probabilities = model.predict_proba(embedding)[0]
 
-        feature_map = [
-            "Gender", "Race", "Age at Release", "Education Level",
-            "Supervision Risk Score", "Residence PUMA", "Jobs per Year"
-        ]
+        response = build_response(prediction_label, explanation, probabilities)
 
-        explanation_text = f"Based on the information provided, the person is predicted to be a {prediction_label}.\n"
+        audit_log.record(
+            user=user,
+            model_version=MODEL_VERSION,
+            inputs={field: data[field] for field in REQUIRED_FIELDS},
+            prediction=prediction_label,
+            probabilities=response["probabilities"],
+            source="predict"
+        )
 
-        feature_importance = {}
+        return response, 200
 
-        for feature, importance in explanation:
-            match = re.match(r"feature_(\d+)", feature)
-            if match:
-                feature_index = int(match.group(1)) % len(feature_map)
-                feature_name = feature_map[feature_index]
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+@app.route('/what_if', methods=['POST'])
+def what_if():
+    """
+    Score a base profile with one or more fields varied, e.g.
+    {"profile": {...}, "vary": {"jobs_per_year": {"start": 0, "stop": 8, "step": 1}}}
+    and return a probability curve per varied field.
+    """
+    try:
+        data = request.json
+        profile = data.get("profile") or {}
 
-                if feature_name not in feature_importance or abs(importance) > abs(feature_importance[feature_name]):
-                    feature_importance[feature_name] = importance
+        for field in REQUIRED_FIELDS:
+            if field not in profile:
+                return jsonify({"error": f"Missing field: {field}"}), 400
 
-        for feature_name, importance in feature_importance.items():
-            explanation_text += f"The person's {feature_name} had a {importance * 100:.2f}% influence on the prediction.\n"
+        try:
+            sweep = expand_sweep(data.get("vary"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        return jsonify({
-            "prediction": prediction_label,
-            "explanation_text": explanation_text,
-            "probabilities": {
-                "Non-Recidivist": round(probabilities[0] * 100, 2),
-                "Recidivist": round(probabilities[1] * 100, 2)
-            }
-        })
+        return schedule(run_what_if, profile, sweep, current_identity())
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def run_what_if(profile, sweep, user):
+    try:
+        if model is None:
+            return {"error": "Model not loaded properly."}, 200
+
+        # The base profile comes first, followed by every variant in sweep order.
+        texts = [build_input_text(profile)]
+        for field, values in sweep.items():
+            texts.extend(build_input_text({**profile, field: value}) for value in values)
+
+        embeddings = get_embeddings(texts)
+        probabilities = model.predict_proba(embeddings)
+
+        curves, offset = {}, 1
+        for field, values in sweep.items():
+            curves[field] = [{"value": value, **format_probabilities(probabilities[offset + i])}
+                             for i, value in enumerate(values)]
+            offset += len(values)
+
+        base = format_probabilities(probabilities[0])
+        # The base profile is a real risk prediction, so it is audited like /predict.
+        audit_log.record(
+            user=user,
+            model_version=MODEL_VERSION,
+            inputs={field: profile[field] for field in REQUIRED_FIELDS},
+            prediction='High Risk of Recidivism' if probabilities[0][1] > probabilities[0][0] else 'Low Risk of Recidivism',
+            probabilities=base,
+            source="what_if"
+        )
+
+        return {"base": base, "curves": curves}, 200
+
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    if drift_baseline is None:
+        return jsonify({"error": "Drift baseline not loaded. Run drift_monitor.py to build it."}), 503
+
+    # Each metric is on its own scale, so each can be overridden separately,
+    # e.g. /drift?numeric_threshold=0.25&categorical_threshold=0.05
+    thresholds = {kind: request.args.get(f"{kind}_threshold", default, type=float)
+                  for kind, default in DRIFT_THRESHOLDS.items()}
+    scores = drift_monitor.drift_scores(drift_baseline)
+    scores["thresholds"] = thresholds
+    scores["drifted"] = find_drifted(scores, thresholds)
+    return jsonify(scores)
+
+@app.route('/scheduler/metrics', methods=['GET'])
+def scheduler_metrics():
+    metrics = inference_scheduler.metrics()
+    for priority, count in rate_limiter.limited.items():
+        metrics[priority]["rate_limited"] = count
+    metrics[INTERACTIVE]["demoted"] = rate_limiter.demoted
+    return jsonify(metrics)
+
 if __name__ == '__main__':
     app.run(debug=True)
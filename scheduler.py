@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+
+class RateLimited(Exception):
+    """Raised when an identity has used up its token bucket."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class QueueFull(Exception):
+    """Raised when a priority queue is at capacity."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's client deadline passed before it reached a worker."""
+
+
+# -------------------------------
+# Rate limiting
+# -------------------------------
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, now=None):
+        """Take one token, returning 0 on success or the seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-identity token buckets, keeping at most max_identities buckets (least recently used evicted)."""
+
+    def __init__(self, limits, max_identities=10000):
+        # limits maps a priority to its (tokens per second, burst capacity).
+        self.limits = limits
+        self.max_identities = max_identities
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = {priority: 0 for priority in limits}
+        self.demoted = 0
+
+    def _consume(self, identity, priority):
+        # Called with the lock held.
+        rate, capacity = self.limits[priority]
+        key = (identity, priority)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            if len(self._buckets) > self.max_identities:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.consume()
+
+    def check(self, identity, priority):
+        with self._lock:
+            retry_after = self._consume(identity, priority)
+            if retry_after > 0:
+                self.limited[priority] += 1
+        if retry_after > 0:
+            raise RateLimited(retry_after)
+
+    def admit(self, identity, priority):
+        """
+        Charge one request to identity and return the priority it should run at.
+        Interactive requests beyond the interactive budget are demoted to bulk
+        instead of being trusted, and RateLimited is raised only once the bulk
+        budget is used up as well.
+        """
+        if priority == INTERACTIVE:
+            with self._lock:
+                if self._consume(identity, INTERACTIVE) == 0:
+                    return INTERACTIVE
+                self.demoted += 1
+        self.check(identity, BULK)
+        return BULK
+
+
+# -------------------------------
+# Priority scheduler
+# -------------------------------
+class _Job:
+    __slots__ = ("fn", "args", "priority", "deadline", "enqueued", "future")
+
+    def __init__(self, fn, args, priority, deadline):
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = Future()
+
+
+class PriorityScheduler:
+    """
+    Runs jobs on a fixed pool of worker threads. Interactive jobs are always
+    taken before bulk jobs, and bulk jobs may only occupy
+    workers - reserved_interactive workers at once, so a bulk backlog cannot
+    hold every worker while analysts wait. Jobs whose deadline has passed
+    by the time a worker picks them up are dropped without running.
+    """
+
+    def __init__(self, workers=4, reserved_interactive=1, max_queue=(256, 1024), window=1000):
+        self.workers = workers
+        self.bulk_slots = max(workers - reserved_interactive, 1)
+        self.max_queue = dict(zip(PRIORITIES, max_queue))
+
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=window) for priority in PRIORITIES}
+        self._counters = {priority: {"completed": 0, "dropped": 0, "rejected": 0} for priority in PRIORITIES}
+        self._cond = threading.Condition()
+
+        self._threads = [threading.Thread(target=self._run, name=f"scheduler-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args, priority=INTERACTIVE, deadline=None):
+        """Queue fn(*args) and return a Future. deadline is a time.monotonic() value."""
+        job = _Job(fn, args, priority, deadline)
+        with self._cond:
+            if len(self._queues[priority]) >= self.max_queue[priority]:
+                self._counters[priority]["rejected"] += 1
+                raise QueueFull(f"{priority} queue is full")
+            self._queues[priority].append(job)
+            self._cond.notify()
+        return job.future
+
+    def _next_job(self):
+        # Called with the condition held.
+        if self._queues[INTERACTIVE]:
+            return self._queues[INTERACTIVE].popleft()
+        if self._queues[BULK] and self._running[BULK] < self.bulk_slots:
+            return self._queues[BULK].popleft()
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+
+                now = time.monotonic()
+                if (job.deadline is not None and now > job.deadline) or not job.future.set_running_or_notify_cancel():
+                    self._counters[job.priority]["dropped"] += 1
+                    if not job.future.cancelled():
+                        job.future.set_exception(DeadlineExceeded("Client deadline passed while queued"))
+                    continue
+                self._running[job.priority] += 1
+                self._waits[job.priority].append(now - job.enqueued)
+
+            try:
+                job.future.set_result(job.fn(*job.args))
+            except Exception as e:
+                job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[job.priority] -= 1
+                    self._counters[job.priority]["completed"] += 1
+                    # A finished bulk job may free a slot for queued bulk work.
+                    self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            result = {}
+            for priority in PRIORITIES:
+                waits = sorted(self._waits[priority])
+                result[priority] = {
+                    "queue_depth": len(self._queues[priority]),
+                    "running": self._running[priority],
+                    "wait_ms_p50": _percentile(waits, 0.50) * 1000,
+                    "wait_ms_p99": _percentile(waits, 0.99) * 1000,
+                    **self._counters[priority],
+                }
+            return result
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
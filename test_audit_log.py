@@ -0,0 +1,144 @@
+import json
+import os
+import time
+
+from audit_log import AuditLog, SQLiteSegmentSink, list_segments, query
+
+
+def make_record(user="analyst", timestamp=None, source="predict"):
+    record = {
+        "user": user,
+        "source": source,
+        "model_version": "abc123",
+        "prediction": "Low Risk of Recidivism",
+        "probabilities": {"Non-Recidivist": 80.0, "Recidivist": 20.0},
+        "inputs": {"gender": "M", "jobs_per_year": 2},
+    }
+    if timestamp is not None:
+        record["timestamp"] = timestamp
+    return record
+
+
+class FailingSink:
+    def write_batch(self, records):
+        raise ConnectionError("sink unavailable")
+
+    def close(self):
+        pass
+
+
+def test_records_are_flushed_to_segments_on_close(tmp_path):
+    sink = SQLiteSegmentSink(str(tmp_path), segment_rows=3)
+    audit = AuditLog(sink, flush_interval=0.05, spill_path=str(tmp_path / "spill.jsonl"))
+    for i in range(7):
+        audit.record(**make_record(timestamp=float(i)))
+    audit.close()
+
+    assert len(list_segments(str(tmp_path))) == 3
+    records = list(query(str(tmp_path)))
+    assert [r["timestamp"] for r in records] == [float(i) for i in range(7)]
+    assert records[0]["inputs"] == {"gender": "M", "jobs_per_year": 2}
+    assert records[0]["source"] == "predict"
+
+
+def test_query_filters_by_user_and_time(tmp_path):
+    sink = SQLiteSegmentSink(str(tmp_path), segment_rows=2)
+    sink.write_batch([make_record("a", 1.0), make_record("b", 2.0)])
+    sink.write_batch([make_record("a", 3.0), make_record("a", 4.0)])
+    sink.close()
+
+    assert [r["timestamp"] for r in query(str(tmp_path), user="a")] == [1.0, 3.0, 4.0]
+    assert [r["timestamp"] for r in query(str(tmp_path), start=2.5)] == [3.0, 4.0]
+    assert len(list(query(str(tmp_path), limit=1))) == 1
+
+
+def test_full_buffer_spills_to_disk_and_replays(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    audit = AuditLog(FailingSink(), max_buffer=1, flush_interval=0.05, spill_path=spill_path)
+    for i in range(5):
+        audit.record(**make_record(timestamp=float(i)))
+    audit.close()
+    assert os.path.exists(spill_path)
+
+    sink = SQLiteSegmentSink(str(tmp_path / "segments"))
+    audit = AuditLog(sink, flush_interval=0.05, spill_path=spill_path)
+    audit._replay_spill()
+    audit.close()
+    assert sorted(r["timestamp"] for r in query(str(tmp_path / "segments"))) == [float(i) for i in range(5)]
+
+
+class RecordingSink:
+    def __init__(self):
+        self.batches = []
+
+    def write_batch(self, records):
+        self.batches.append(list(records))
+
+    def close(self):
+        pass
+
+
+def test_replay_resumes_file_left_by_a_crash_and_streams_in_batches(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    with open(spill_path + ".replay", "w") as f:
+        for i in range(5):
+            f.write(json.dumps(make_record(timestamp=float(i))) + "\n")
+    with open(spill_path, "w") as f:
+        f.write(json.dumps(make_record(timestamp=5.0)) + "\n")
+
+    sink = RecordingSink()
+    audit = AuditLog(sink, batch_size=2, flush_interval=0.05, spill_path=spill_path)
+    assert audit._replay_spill()
+    assert audit._replay_spill()
+    audit.close()
+
+    assert [len(batch) for batch in sink.batches] == [2, 2, 1, 1]
+    assert [r["timestamp"] for batch in sink.batches for r in batch] == [float(i) for i in range(6)]
+    assert not os.path.exists(spill_path) and not os.path.exists(spill_path + ".replay")
+
+
+class RecoveringSink(RecordingSink):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def write_batch(self, records):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("sink unavailable")
+        super().write_batch(records)
+
+
+def test_spill_drains_while_traffic_keeps_arriving(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    sink = RecoveringSink(failures=1)
+    audit = AuditLog(sink, batch_size=5, flush_interval=0.2, spill_path=spill_path)
+    for i in range(5):
+        audit.record(**make_record(timestamp=float(i)))
+
+    # Keep the queue busy so the writer never sees a whole idle flush_interval.
+    drained = False
+    for i in range(5, 200):
+        audit.record(**make_record(timestamp=float(i)))
+        if not audit._has_spilled() and sink.failures == 0:
+            drained = True
+            break
+        time.sleep(0.02)
+    audit.close()
+
+    assert drained
+    assert sorted(r["timestamp"] for batch in sink.batches for r in batch) == [float(i) for i in range(i + 1)]
+
+
+def test_close_replays_the_spill(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    with open(spill_path, "w") as f:
+        for i in range(3):
+            f.write(json.dumps(make_record(timestamp=float(i))) + "\n")
+
+    sink = RecordingSink()
+    audit = AuditLog(sink, flush_interval=1.0, spill_path=spill_path)
+    audit.close()
+
+    assert [r["timestamp"] for batch in sink.batches for r in batch] == [0.0, 1.0, 2.0]
+    assert not os.path.exists(spill_path)
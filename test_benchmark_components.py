@@ -0,0 +1,20 @@
+from benchmark_components import find_regressions
+
+
+def test_find_regressions_respects_tolerance_edges():
+    baseline = {"results": {"fast": 2.0, "slow": 2.0, "exact": 2.0}}
+    results = {"fast": 1.0, "slow": 2.6, "exact": 2.5}
+
+    regressions = find_regressions(results, baseline, tolerance=0.25)
+    assert regressions == [("slow", 2.0, 2.6)]
+
+
+def test_find_regressions_zero_tolerance_flags_any_slowdown():
+    baseline = {"results": {"component": 1.0}}
+    assert find_regressions({"component": 1.0}, baseline, tolerance=0) == []
+    assert find_regressions({"component": 1.001}, baseline, tolerance=0) == [("component", 1.0, 1.001)]
+
+
+def test_find_regressions_skips_components_without_baseline():
+    baseline = {"results": {"known": 1.0}}
+    assert find_regressions({"known": 1.0, "new_component": 100.0}, baseline) == []
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from dataset_cache import TEXT_COLUMNS, build_model_text, load_dataset
+
+
+def make_csv(path):
+    pd.DataFrame({
+        "ID": [1, 2, 3, 4],
+        "Gender": ["M", "F", "M", "M"],
+        "Race": ["BLACK", "WHITE", "WHITE", "BLACK"],
+        "Age_at_Release": ["18-22", "48 or older", "23-27", "18-22"],
+        "Education_Level": ["High School Diploma", "At least some college", np.nan, "Less than HS diploma"],
+        "Supervision_Risk_Score_First": [3.0, np.nan, 7.0, 10.0],
+        "Residence_PUMA": [16, 3, 12, 16],
+        "Jobs_Per_Year": [0.0, 1.5, 0.333333333, 2.0],
+    }).to_csv(path, index=False)
+
+
+def test_cache_projects_columns_and_keeps_row_ids(tmp_path):
+    csv_path, cache_path = str(tmp_path / "data.csv"), str(tmp_path / "data.parquet")
+    make_csv(csv_path)
+
+    df = load_dataset(["Gender", "Race"], csv_path=csv_path, cache_path=cache_path)
+    assert list(df.columns) == ["Gender", "Race"]
+    assert list(df.index) == [0, 1, 2, 3]
+    assert isinstance(df["Gender"].dtype, pd.CategoricalDtype)
+
+    filtered = load_dataset(["Gender"], filters=[("Race", "==", "WHITE")], csv_path=csv_path, cache_path=cache_path)
+    assert list(filtered.index) == [1, 2]
+
+
+def test_model_text_matches_the_training_text(tmp_path):
+    csv_path, cache_path = str(tmp_path / "data.csv"), str(tmp_path / "data.parquet")
+    make_csv(csv_path)
+    # Spelled out rather than built with astype(str), whose handling of NaN changed in pandas 3.
+    expected = [
+        "M BLACK 18-22 High School Diploma 3.0 16 0.0",
+        "F WHITE 48 or older At least some college nan 3 1.5",
+        "M WHITE 23-27 nan 7.0 12 0.333333333",
+        "M BLACK 18-22 Less than HS diploma 10.0 16 2.0",
+    ]
+
+    cached = load_dataset(TEXT_COLUMNS, csv_path=csv_path, cache_path=cache_path)
+    assert build_model_text(cached).tolist() == expected
@@ -0,0 +1,117 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from drift_monitor import (DRIFT_THRESHOLDS, CountMinSketch, DriftMonitor, HistogramQuantileSketch, RunningMoments,
+                           build_baseline, find_drifted)
+
+AGE_BRACKETS = {"18-22": (18, 22), "23-27": (23, 27), "28-32": (28, 32), "48 or older": (48, 80)}
+
+
+def make_training_frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Gender": rng.choice(["M", "F"], size=n, p=[0.85, 0.15]),
+        "Race": rng.choice(["BLACK", "WHITE"], size=n),
+        "Age_at_Release": rng.choice(list(AGE_BRACKETS), size=n),
+        "Education_Level": rng.choice(["High School Diploma", "At least some college"], size=n),
+        "Supervision_Risk_Score_First": rng.integers(1, 11, size=n),
+        "Residence_PUMA": rng.integers(1, 26, size=n),
+        "Jobs_Per_Year": rng.uniform(0, 3, size=n),
+    })
+
+
+def make_request(gender="M", age=25, jobs=1.0):
+    return {
+        "gender": gender,
+        "race": "BLACK",
+        "age_at_release": age,
+        "education_level": "High School Diploma",
+        "supervision_risk_score_first": 5,
+        "residence_puma": "3",
+        "jobs_per_year": jobs,
+    }
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(width=16, depth=3)
+    for key, count in [("M", 40), ("F", 7), ("X", 1)]:
+        sketch.update(key, count)
+    assert sketch.estimate("M") >= 40
+    assert sketch.estimate("F") >= 7
+    assert sketch.total == 48
+
+
+def test_histogram_quantile_is_within_one_bin():
+    sketch = HistogramQuantileSketch(np.linspace(0, 10, 21))
+    for value in np.linspace(0, 9.99, 1000):
+        sketch.update(value)
+    assert sketch.quantile(0.5) == pytest.approx(5.0, abs=0.5)
+
+
+def test_histogram_quantile_reports_values_above_the_range():
+    sketch = HistogramQuantileSketch(np.linspace(0, 8, 33))
+    for value in [1.0] * 5 + [12.0] * 5:
+        sketch.update(value)
+    assert sketch.quantile(0.9) == 8.0
+    assert sketch.out_of_range() == 0.5
+
+
+def test_matching_traffic_scores_lower_than_shifted_traffic():
+    df = make_training_frame()
+    embeddings = np.random.default_rng(1).normal(size=(len(df), 8))
+    baseline = build_baseline(df, embeddings)
+
+    similar, shifted = DriftMonitor(embedding_dim=8), DriftMonitor(embedding_dim=8)
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        similar.update(make_request(), rng.normal(size=(1, 8)))
+        shifted.update(make_request(gender="F", age=70, jobs=7.5), rng.normal(loc=3.0, size=(1, 8)))
+
+    similar_scores = similar.drift_scores(baseline)
+    shifted_scores = shifted.drift_scores(baseline)
+    assert shifted_scores["fields"]["gender"] > similar_scores["fields"]["gender"]
+    assert shifted_scores["fields"]["jobs_per_year"] > similar_scores["fields"]["jobs_per_year"]
+    assert shifted_scores["embedding"] > similar_scores["embedding"]
+
+
+def test_each_metric_uses_its_own_threshold():
+    # The same score is drift for a categorical field but not for a numeric one.
+    scores = {"fields": {"gender": 0.15, "jobs_per_year": 0.15}, "embedding": 0.3}
+    assert find_drifted(scores) == ["gender"]
+    assert find_drifted(scores, {"numeric": 0.1, "categorical": 0.2, "embedding": 0.2}) == ["jobs_per_year", "embedding"]
+
+
+def test_raw_ages_from_training_brackets_do_not_drift():
+    df = make_training_frame(n=2000)
+    baseline = build_baseline(df)
+
+    # Live traffic sends raw integer ages; draw them from the same brackets as training.
+    monitor = DriftMonitor()
+    rng = np.random.default_rng(3)
+    for bracket in rng.choice(df["Age_at_Release"], size=1000):
+        low, high = AGE_BRACKETS[bracket]
+        monitor.update(make_request(age=int(rng.integers(low, high + 1))))
+
+    assert monitor.drift_scores(baseline)["fields"]["age_at_release"] < DRIFT_THRESHOLDS["numeric"]
+
+
+def test_running_moments_match_batch_variance():
+    vectors = np.random.default_rng(4).normal(size=(50, 6))
+    moments = RunningMoments(6)
+    for vector in vectors:
+        moments.update(vector)
+    batch = RunningMoments.from_array(vectors)
+    assert np.allclose(moments.mean, batch.mean)
+    assert np.allclose(moments.variance(), vectors.var(axis=0, ddof=1))
+    assert np.allclose(batch.variance(), vectors.var(axis=0, ddof=1))
+
+
+def test_monitor_survives_pickling():
+    monitor = DriftMonitor(embedding_dim=4)
+    monitor.update(make_request(), np.ones((1, 4)))
+    restored = pickle.loads(pickle.dumps(monitor))
+    restored.update(make_request(), np.ones((1, 4)))
+    assert restored.count == 2
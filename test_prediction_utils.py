@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from prediction_utils import MAX_WHAT_IF_POINTS, EmbeddingCache, build_input_text, expand_sweep
+
+
+def test_expand_sweep_accepts_lists_and_inclusive_ranges():
+    sweep = expand_sweep({
+        "jobs_per_year": {"start": 0, "stop": 2, "step": 0.5},
+        "education_level": ["High School Diploma", "At least some college"],
+    })
+    assert sweep["jobs_per_year"] == [0, 0.5, 1.0, 1.5, 2.0]
+    assert sweep["education_level"] == ["High School Diploma", "At least some college"]
+    assert expand_sweep({"age_at_release": {"start": 18, "stop": 20}}) == {"age_at_release": [18, 19, 20]}
+
+
+@pytest.mark.parametrize("vary", [
+    None,
+    {},
+    {"height": [1, 2]},
+    {"jobs_per_year": {"start": 2, "stop": 0}},
+    {"jobs_per_year": {"start": 0, "stop": 8, "step": 0}},
+    {"jobs_per_year": {"start": "a", "stop": 8}},
+    {"jobs_per_year": {"start": 0, "stop": MAX_WHAT_IF_POINTS}},
+    {"jobs_per_year": {"start": 0, "stop": float("inf")}},
+    {"jobs_per_year": {"start": 0, "stop": float("nan")}},
+    {"jobs_per_year": {"start": 0, "stop": 8, "step": 1e-308}},
+    {"jobs_per_year": {"start": -1e308, "stop": 1e308}},
+])
+def test_expand_sweep_rejects_bad_grids(vary):
+    with pytest.raises(ValueError):
+        expand_sweep(vary)
+
+
+def test_embedding_cache_embeds_only_misses_in_one_batch():
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(text))] for text in texts])
+
+    cache = EmbeddingCache(maxsize=2)
+    assert cache.get_many(["a", "bb", "a"], embed).tolist() == [[1.0], [2.0], [1.0]]
+    assert cache.get_many(["bb", "ccc"], embed).tolist() == [[2.0], [3.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
+
+
+def test_embedding_cache_does_not_hold_the_batch_array():
+    cache = EmbeddingCache()
+    cache.get_many(["a", "b"], lambda texts: np.ones((len(texts), 768)))
+    assert all(row.base is None for row in cache._entries.values())
+
+
+def test_build_input_text_follows_field_order():
+    profile = {"jobs_per_year": 2, "gender": "M", "race": "WHITE", "age_at_release": 30,
+               "education_level": "High School", "supervision_risk_score_first": 5, "residence_puma": "3"}
+    assert build_input_text(profile) == "M WHITE 30 High School 5 3 2"
@@ -0,0 +1,120 @@
+import os
+import threading
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from scheduler import BULK, INTERACTIVE, PriorityScheduler, RateLimiter
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    # Import the app without Firebase credentials or a BERT download, from a
+    # scratch directory so the audit log directory is not created in the repo.
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("api"))
+    with mock.patch("firebase_admin.credentials.Certificate"), \
+            mock.patch("firebase_admin.initialize_app"), \
+            mock.patch("firebase_admin.firestore.client"), \
+            mock.patch("transformers.BertTokenizer.from_pretrained", side_effect=OSError("offline")), \
+            mock.patch("transformers.BertModel.from_pretrained", side_effect=OSError("offline")), \
+            mock.patch.dict(os.environ, {"AUDIT_SINK": "firestore"}):
+        try:
+            import recidi_api
+        finally:
+            os.chdir(cwd)
+    return recidi_api
+
+
+@pytest.fixture
+def limits(api, monkeypatch):
+    monkeypatch.setattr(api, "rate_limiter", RateLimiter({INTERACTIVE: (0.001, 1), BULK: (0.001, 1)}))
+    monkeypatch.setattr(api, "inference_scheduler", PriorityScheduler(workers=1, reserved_interactive=0))
+    return api
+
+
+def call_schedule(api, fn, *args, headers=None):
+    with api.app.test_request_context("/predict", method="POST", headers=headers or {}):
+        return api.app.make_response(api.schedule(fn, *args))
+
+
+@pytest.mark.parametrize("timeout", ["inf", "nan", "0", "-5"])
+def test_schedule_rejects_bad_client_timeouts(limits, timeout):
+    ran = []
+    response = call_schedule(limits, ran.append, 1, headers={"X-Client-Timeout": timeout})
+    assert response.status_code == 400
+    assert ran == []
+    # The rejected request did not use up the caller's token.
+    assert call_schedule(limits, lambda: ({"ok": True}, 200)).status_code == 200
+
+
+def test_schedule_demotes_then_rate_limits(limits):
+    ok = lambda: ({"ok": True}, 200)
+    assert call_schedule(limits, ok).status_code == 200
+    assert call_schedule(limits, ok).status_code == 200
+    assert limits.inference_scheduler.metrics()[BULK]["completed"] == 1
+
+    response = call_schedule(limits, ok)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_schedule_times_out_with_504(limits):
+    release = threading.Event()
+    response = call_schedule(limits, release.wait, 5, headers={"X-Client-Timeout": "0.05"})
+    release.set()
+    assert response.status_code == 504
+
+
+PROFILE = {"gender": "M", "race": "BLACK", "age_at_release": 30, "education_level": "High School Diploma",
+           "supervision_risk_score_first": 5, "residence_puma": "3", "jobs_per_year": 1}
+
+
+class FakeModel:
+    # The stub embedding is the row's position, which becomes its Recidivist percentage.
+    def predict_proba(self, X):
+        p = X[:, 0] / 100
+        return np.column_stack([1 - p, p])
+
+
+def test_what_if_maps_base_and_variants_to_curves(api, monkeypatch):
+    embedded = []
+
+    def get_embeddings(texts):
+        embedded.append(list(texts))
+        return np.arange(len(texts), dtype=float).reshape(-1, 1)
+
+    monkeypatch.setattr(api, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(api, "model", FakeModel())
+    monkeypatch.setattr(api, "audit_log", mock.Mock())
+
+    sweep = {"jobs_per_year": [0, 2], "education_level": ["GED"]}
+    body, status = api.run_what_if(PROFILE, sweep, "analyst")
+
+    assert status == 200
+    assert embedded == [[api.build_input_text(PROFILE),
+                         api.build_input_text({**PROFILE, "jobs_per_year": 0}),
+                         api.build_input_text({**PROFILE, "jobs_per_year": 2}),
+                         api.build_input_text({**PROFILE, "education_level": "GED"})]]
+    assert body["base"] == {"Non-Recidivist": 100.0, "Recidivist": 0.0}
+    assert body["curves"] == {
+        "jobs_per_year": [{"value": 0, "Non-Recidivist": 99.0, "Recidivist": 1.0},
+                          {"value": 2, "Non-Recidivist": 98.0, "Recidivist": 2.0}],
+        "education_level": [{"value": "GED", "Non-Recidivist": 97.0, "Recidivist": 3.0}],
+    }
+    api.audit_log.record.assert_called_once()
+    assert api.audit_log.record.call_args.kwargs["source"] == "what_if"
+    assert api.audit_log.record.call_args.kwargs["prediction"] == "Low Risk of Recidivism"
+
+
+@pytest.mark.parametrize("payload", [
+    {"profile": {k: v for k, v in PROFILE.items() if k != "race"}, "vary": {"jobs_per_year": [0, 1]}},
+    {"profile": PROFILE},
+    {"profile": PROFILE, "vary": {"jobs_per_year": {"start": 0, "stop": float("inf")}}},
+    {"profile": PROFILE, "vary": {"height": [1, 2]}},
+])
+def test_what_if_rejects_bad_requests(api, payload):
+    response = api.app.test_client().post("/what_if", json=payload)
+    assert response.status_code == 400
+    assert "error" in response.json
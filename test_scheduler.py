@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import BULK, INTERACTIVE, DeadlineExceeded, PriorityScheduler, QueueFull, RateLimited, RateLimiter, TokenBucket
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.consume(now=bucket.updated) == 0
+    assert bucket.consume(now=bucket.updated) == 0
+    assert bucket.consume(now=bucket.updated) == pytest.approx(0.5)
+    assert bucket.consume(now=bucket.updated + 0.5) == 0
+
+
+def test_rate_limiter_is_per_identity():
+    limiter = RateLimiter({INTERACTIVE: (1, 1), BULK: (1, 1)})
+    limiter.check("alice", INTERACTIVE)
+    limiter.check("bob", INTERACTIVE)
+    with pytest.raises(RateLimited):
+        limiter.check("alice", INTERACTIVE)
+    assert limiter.limited[INTERACTIVE] == 1
+
+
+def test_callers_over_the_interactive_budget_are_demoted_to_bulk():
+    limiter = RateLimiter({INTERACTIVE: (0.001, 1), BULK: (0.001, 1)})
+    assert limiter.admit("script", INTERACTIVE) == INTERACTIVE
+    assert limiter.admit("script", INTERACTIVE) == BULK
+    with pytest.raises(RateLimited):
+        limiter.admit("script", INTERACTIVE)
+    assert limiter.admit("analyst", INTERACTIVE) == INTERACTIVE
+    assert limiter.demoted == 2
+    assert limiter.limited == {INTERACTIVE: 0, BULK: 1}
+
+
+def test_interactive_jobs_skip_the_bulk_backlog():
+    release = threading.Event()
+    scheduler = PriorityScheduler(workers=2, reserved_interactive=1)
+
+    bulk = [scheduler.submit(release.wait, 5, priority=BULK) for _ in range(5)]
+    time.sleep(0.05)
+    # One worker is held by bulk work, the reserved one serves interactive traffic.
+    assert scheduler.submit(lambda: "done", priority=INTERACTIVE).result(timeout=1) == "done"
+    assert scheduler.metrics()[BULK]["queue_depth"] == 4
+
+    release.set()
+    assert all(future.result(timeout=1) for future in bulk)
+
+
+def test_expired_jobs_are_dropped_without_running():
+    release = threading.Event()
+    scheduler = PriorityScheduler(workers=1, reserved_interactive=0)
+    blocker = scheduler.submit(release.wait, 5)
+    ran = []
+    expired = scheduler.submit(ran.append, 1, deadline=time.monotonic() + 0.01)
+    time.sleep(0.05)
+    release.set()
+
+    with pytest.raises(DeadlineExceeded):
+        expired.result(timeout=1)
+    assert blocker.result(timeout=1)
+    assert ran == []
+    assert scheduler.metrics()[INTERACTIVE]["dropped"] == 1
+
+
+def test_full_queue_rejects_new_jobs():
+    release = threading.Event()
+    scheduler = PriorityScheduler(workers=1, reserved_interactive=0, max_queue=(1, 1))
+    scheduler.submit(release.wait, 5)
+    time.sleep(0.05)
+    scheduler.submit(release.wait, 5)
+    with pytest.raises(QueueFull):
+        scheduler.submit(release.wait, 5)
+    release.set()